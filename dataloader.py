@@ -1,6 +1,75 @@
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import csv
+import os
 import re
+import shutil
+
+
+# a single pgn header line, e.g. [WhiteElo "1500"]
+HDR_RE = re.compile(r'\[(\w+) "([^"]*)"\]')
+
+# number of games buffered before they are flushed to the csv file
+WRITE_BATCH_SIZE = 10000
+
+CSV_HEADER = ["Event", "Site", "Date", "Round", "White", "Black", "Result", "UTCDate", "UTCTime", "WhiteElo",
+              "BlackElo", "WhiteRatingDiff", "BlackRatingDiff", "WhiteTitle", "BlackTitle", "ECO",
+              "Opening", "TimeControl", "Termination", "Gameplay"]
+
+
+def _parse_pgn_to_csv(path_pgn, path_part, stockfish_analysis):
+    """
+    Parses one pgn database into a header-less partial csv file.
+
+    Module-level function so it can run in a worker process,
+    see DataLoader.create_csv.
+
+    Parameters
+    ----------
+    path_pgn : str
+        path of the .pgn file to parse
+    path_part : str
+        path of the partial csv file to write
+    stockfish_analysis : bool
+        if true, only games with Stockfish analysis are extracted
+
+    Return
+    ------
+    i : int
+        number of games written to the partial file
+    """
+
+    i = 0
+    with open(path_part, "w", newline="", buffering=1 << 20) as csvfile:
+        filewriter = csv.writer(csvfile, delimiter=",")
+
+        batch = []
+        # bind the hot lookups to locals, attribute resolution per game adds up
+        batch_append = batch.append
+        hdr_findall = HDR_RE.findall
+        writerows = filewriter.writerows
+
+        # stream the pgn game by game, the raw databases are far too
+        # big to be loaded into memory at once
+        with open(path_pgn, "r", buffering=1 << 20) as f:
+            games = DataLoader._iter_games(tqdm(f, unit_scale=True))
+            for headers, gameplay in games:
+                if stockfish_analysis and "eval" not in gameplay:
+                    continue
+                # some headers (e.g. LichessId) are not part of the csv and get dropped here
+                get_value = dict(hdr_findall(headers)).get
+                data = [get_value(column, "") for column in CSV_HEADER]
+                data[-1] = gameplay  # 'Gameplay' is the last csv column
+                batch_append(data)
+                i += 1
+
+                # flush in batches so the buffered rows stay small
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    writerows(batch)
+                    batch.clear()
+        writerows(batch)
+
+    return i
 
 
 class DataLoader:
@@ -28,59 +97,48 @@ class DataLoader:
             if true, only games with Stockfish analysis are extracted
         """
 
-        # create new csv file
-        if path_csv.endswith("/"):
-            path_csv = path_csv[:-1]
-
-        csv_header = ["Event", "Site", "Date", "Round", "White", "Black", "Result", "UTCDate", "UTCTime", "WhiteElo",
-                      "BlackElo", "WhiteRatingDiff", "BlackRatingDiff", "WhiteTitle", "BlackTitle", "ECO",
-                      "Opening", "TimeControl", "Termination", "Gameplay"]
-
-        with open(path_csv + "/" + name_csv, "wt") as csvfile:
-            filewriter = csv.writer(csvfile, delimiter=",")
-            filewriter.writerow(csv_header)
-
-        csv_dict = dict(Event=0, Site=1, Date=2, Round=3, White=4, Black=5, Result=6, UTCDate=7, UTCTime=8,
-                        WhiteElo=9, BlackElo=10, WhiteRatingDiff=11, BlackRatingDiff=12, WhiteTitle=13,
-                        BlackTitle=14, ECO=15, Opening=16, TimeControl=17, Termination=18, Gameplay=19)
-
-        # read all png databases
-        if path_databases.endswith("/"):
-            path_databases = path_csv[:-1]
-
-        i = 0
-        for db in databases:
-            f = open(path_databases + "/" + db, "r")
-            lines = f.readlines()
-
-            data = [""] * 20
-            for line in tqdm(lines):
-                if line != "\n":
-                    item = line.split()[0][1:]
-                    if item == ".":  # Gameplay
-                        item = "Gameplay"
-                        data[csv_dict[item]] = line
-                    else:
-                        key = re.findall('"([^"]*)"', line)
-
-                        if key and item != "LichessId":  # some games don't have any Gameplay, and don't save LichessId
-                            data[csv_dict[item]] = key[0]
-                else:
-                    continue
+        # the databases are independent, parse them in parallel worker
+        # processes, each writing its own header-less partial csv
+        partials = [os.path.join(path_csv, name_csv + ".part%d" % n) for n in range(len(databases))]
+        with ProcessPoolExecutor(max_workers=min(len(databases), os.cpu_count())) as executor:
+            counts = list(executor.map(_parse_pgn_to_csv,
+                                       [os.path.join(path_databases, db) for db in databases],
+                                       partials,
+                                       [stockfish_analysis] * len(databases)))
+
+        # concatenate the partial files behind the header row
+        with open(os.path.join(path_csv, name_csv), "w", newline="", buffering=1 << 20) as csvfile:
+            csv.writer(csvfile, delimiter=",").writerow(CSV_HEADER)
+            for part in partials:
+                with open(part, "r") as f:
+                    shutil.copyfileobj(f, csvfile)
+                os.remove(part)
+
+        print(sum(counts), " games found")
 
-                # add data to csv, since 'Gameplay' is last item of a dataset
-                if item == "Gameplay":
-                    if stockfish_analysis and "eval" in line:
-                        with open(path_csv + "/" + name_csv, "a") as csvfile:
-                            filewriter = csv.writer(csvfile, delimiter=",")
-                            filewriter.writerow(data)
-                            i += 1
-                    elif not stockfish_analysis:
-                        with open(path_csv + "/" + name_csv, "a") as csvfile:
-                            filewriter = csv.writer(csvfile, delimiter=",")
-                            filewriter.writerow(data)
+    @staticmethod
+    def _iter_games(pgn_file):
+        """
+        Iterates over the games of an open pgn file without loading it into memory
 
-                    data = [""] * 20
+        Parameters
+        ----------
+        pgn_file : iterable
+            open .pgn file (or any iterable of its lines)
 
-        print(i, " games found")
+        Return
+        ------
+        games : generator
+            yields one (headers, gameplay) string pair per game
+        """
 
+        headers = []
+        for line in pgn_file:
+            if line.startswith("["):
+                headers.append(line)
+            elif line != "\n":
+                # the move line terminates a game record, games without any
+                # gameplay are skipped just like before
+                if line.startswith("1."):
+                    yield "".join(headers), line.rstrip("\n")
+                headers = []
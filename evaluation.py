@@ -1,8 +1,18 @@
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
-import math
-import copy
- 
+
+
+# maps a square (e.g. e4) to its index in the flat 8x8 board array,
+# a8 is index 0 and h1 is index 63
+SQUARE_IDX = {file + rank: (8 - int(rank)) * 8 + (ord(file) - 97)
+              for file in "abcdefgh" for rank in "12345678"}
+
+# the king's destination square when castling, resolved per player so
+# castling moves can be encoded like any other move
+CASTLING_IDX = {("O-O", "w"): SQUARE_IDX["g1"], ("O-O", "b"): SQUARE_IDX["g8"],
+                ("O-O-O", "w"): SQUARE_IDX["c1"], ("O-O-O", "b"): SQUARE_IDX["c8"]}
+
 
 class Evaluation:
     """
@@ -35,35 +45,39 @@ class Evaluation:
             dictionary containing all moves per chess piece
         """
 
-        pieces_dict = {"P": [], "N": [], "B": [], "R": [], "Q": [], "K": []}
-        blunders_by_elo = {k: copy.deepcopy(pieces_dict) for k in range(800, 2700, 100)}
-        moves_by_elo = {k: copy.deepcopy(pieces_dict) for k in range(800, 2700, 100)}
+        # fresh dicts of empty lists per elo bucket, building them directly is
+        # far cheaper than deep-copying a template dict
+        blunders_by_elo = {k: {p: [] for p in "PNBRQK"} for k in range(800, 2700, 100)}
+        moves_by_elo = {k: {p: [] for p in "PNBRQK"} for k in range(800, 2700, 100)}
+
+        # drop unsuitable games once with vectorized masks instead of checking
+        # them per row inside the loop: too bad or too good players (too little
+        # data available), players whose skill level differs too much and games
+        # that last less than 15 moves
+        df = df.loc[Evaluation._suitable_games_mask(df)].copy()
+        # floor the match elo to the nearest 100 to bucket it
+        df["MatchElo"] = (df[["WhiteElo", "BlackElo"]].min(axis=1) // 100) * 100
 
         # create blunder dict
-        for index, row in tqdm(df.iterrows()):
+        # itertuples avoids building a Series per row, namedtuple attribute access is much cheaper
+        for row in tqdm(df.itertuples(index=False)):
+            blunders = row.Blunders
             # ignore games without blunders
-            if len(row.Blunders) == 0:
-                continue
-            # ignore games where skill level of the players differ too much
-            if abs(row.WhiteElo - row.BlackElo) > 100:
-                continue
-            match_elo = min(row.WhiteElo, row.BlackElo)
-            # ignoring too bad or too good player (too little data available)
-            if match_elo < 800 or match_elo > 2600:
-                continue
-            # ignore games that last less than 15 moves
-            if len(row.Gameplay) < 15:
+            if len(blunders) == 0:
                 continue
 
             result = row.Result
-            # floor match_elo to nearest 100
-            match_elo = math.floor(match_elo / 100) * 100
+            gameplay = row.Gameplay
+            # bind the elo bucket dicts once per game, saving one chained dict
+            # lookup per blunder and per half-move below
+            blunder_bucket = blunders_by_elo[row.MatchElo]
+            move_bucket = moves_by_elo[row.MatchElo]
 
             ######################
             # start blunder dict #
             ######################
 
-            for blunder in row.Blunders:
+            for blunder in blunders:
                 num_move, player, move, ann, eval_diff = blunder
 
                 # ignore too small or too large blunders
@@ -71,97 +85,86 @@ class Evaluation:
                     continue
 
                 player_num = 0 if player == "w" else 1
-                remaining_pieces = row.Gameplay[num_move - 1][player_num][3]
-                # account for promotions,
-                # they are marked with uppersize char at the end of move
-                if move[-1].isupper() and move[-1] != "O":
-                    move = move[:-1]
-                square = move[-2:]
-                
-                # decide which piece did the blunder
-                if move[0].isupper():
-                    piece = move[0]
-                    # account for castling and set moving piece to king
-                    if piece == "O":
-                        piece = "K"
-                        if "O-O-O" in move:
-                            square = "O-O-O"
-                        elif "O-O" in move:
-                            square = "O-O"
-                else:
-                    piece = "P"
+                remaining_pieces = gameplay[num_move - 1][player_num][3]
+                # decide which piece did the blunder and where it landed
+                piece, square = Evaluation._classify_move(move, player)
                 # append data to blunder dict at correct keys
-                blunders_by_elo[match_elo][piece].append([square, eval_diff, player, result, num_move, remaining_pieces])
+                blunder_bucket[piece].append([square, eval_diff, player, result, num_move, remaining_pieces])
 
             ###################
             # start move_dict #
             ###################
 
-            for i, move in enumerate(row.Gameplay):
+            for i, move in enumerate(gameplay):
                 if len(move) < 2:  # last move before game ends
                     break
 
                 for j, half_move in enumerate(move):
-                    # account for promotions,
-                    # they are marked with uppercase char at the end
-                    if half_move[0][-1].isupper() and half_move[0][-1] != "O":
-                        half_move[0] = half_move[0][:-1]
-                    square = half_move[0][-2:]
-
-                    # find piece which did the move
-                    if half_move[0][0].isupper():
-                        piece = half_move[0][0]
-                        # account for castling, and set moving piece to king
-                        if piece == "O":
-                            piece = "K"
-                            if "O-O-O" in half_move:
-                                square = "O-O-O"
-                            elif "O-O" in half_move:
-                                square = "O-O"
-                    else:
-                        piece = "P"
                     player = "w" if j == 0 else "b"
+                    # find piece which did the move and where it landed
+                    piece, square = Evaluation._classify_move(half_move[0], player)
                     num_move = i + 1
                     remaining_pieces = half_move[3]
 
                     # append data to moves dict at correct keys
-                    moves_by_elo[match_elo][piece].append([square, player, result, num_move, remaining_pieces])
+                    move_bucket[piece].append([square, player, result, num_move, remaining_pieces])
 
         return blunders_by_elo, moves_by_elo
 
-    @staticmethod 
-    def merge_dicts_of_lists(dict1, dict2):
+    @staticmethod
+    def _suitable_games_mask(df):
         """
-        merge to dictionaries with the same keys, by appending their list values
+        Builds a boolean mask of the games that qualify for the evaluation.
 
         Parameters
         ----------
-        dict1 : dict
-        dict2 : dict
+        df : pd.df
+            dataframe containing data on chess games
 
         Return
         ------
-        dict : dict
+        mask : pd.Series
+            boolean mask, True for games with 800 <= Elo <= 2600, at most
+            100 Elo difference between the players and at least 15 moves
         """
-        return {key: value + dict2[key] for key, value in dict1.items()}
+        match_elo = df[["WhiteElo", "BlackElo"]].min(axis=1)
+        return ((match_elo >= 800) & (match_elo <= 2600)
+                & ((df.WhiteElo - df.BlackElo).abs() <= 100)
+                & (df.Gameplay.str.len() >= 15))
 
     @staticmethod
-    def square_to_index(square):
+    def _classify_move(move, player):
         """
-        calculate the correct index in the array (len=64) based on a given square (e.g. e4)
+        Determines which piece made a move and on which square it landed.
+
+        Storing the square as its board index right here means all later
+        consumers work on small ints instead of strings.
 
         Parameters
         ----------
-        square : char, int
+        move : str
+            move string in algebraic notation, e.g. Qxe5
+        player : char
+            the moving player ("w"/"b"), needed to resolve castling
 
         Return
         ------
-        index : int
+        (piece, square) : (char, int)
+            piece \in {P, N, B, R, Q, K}; square as index into the flat
+            8x8 board array, see SQUARE_IDX, castling moves resolve to
+            the king's destination square
         """
-        letter = (ord(square[0]) - 97)  # ASCI code of a = 97
-        number = 8 - int(square[1])
-        index = (8 * number) + letter
-        return index
+        # account for promotions,
+        # they are marked with uppercase char at the end of move
+        if move[-1].isupper() and move[-1] != "O":
+            move = move[:-1]
+        first = move[0]
+        if not first.isupper():
+            return "P", SQUARE_IDX[move[-2:]]
+        # account for castling and set moving piece to king
+        if first == "O":
+            return "K", CASTLING_IDX[("O-O-O" if "O-O-O" in move else "O-O", player)]
+        return first, SQUARE_IDX[move[-2:]]
 
 
 
@@ -180,166 +183,164 @@ class Evaluation:
             pandas dataframe containing features of blunders
         """
 
-        # create new dataframe for linear regression
-        data = []
-
-        for index, row in tqdm(dataframe.iterrows()):
-            match_elo = min(row.WhiteElo, row.BlackElo)
-            if match_elo < 800 or match_elo > 2600 or abs(row.WhiteElo - row.BlackElo) > 100:
-                continue
+        data_header = ["Color", "Elo", "Termination", "GameLength", "RemainingPieces", "Blunder1", "Blunder3",
+                     "Blunder9", "BlunderInf",
+                     "BlunderPercentagePawn", "BlunderPercentageKnight", "BlunderPercentageBishop",
+                     "BlunderPercentageRook", "BlunderPercentageQueen", "BlunderPercentageKing",
+                     "BlunderPercentageWeighted", "MovesPercentagePawn", "MovesPercentageKnight", "MovesPercentageBishop",
+                     "MovesPercentageRook", "MovesPercentageQueen", "MovesPercentageKing", "MovesPercentageWeighted",
+                     "AvgBlunderTime"]
 
-            # check if match contains blunders
-            if not list(filter(lambda x: x[1] == "w" and x[4] >= 1, row.Blunders)):  # not enough white blunders
+        # drop unsuitable games once with a vectorized mask instead of checking
+        # elo range, elo difference and game length per row inside the loop
+        dataframe = dataframe.loc[self._suitable_games_mask(dataframe)].reset_index(drop=True)
+
+        # preallocate the feature matrix (two rows per game, one per player)
+        # and fill it by index, cheaper than boxing every row into a list and
+        # converting the list of lists at the end
+        rows = np.empty((2 * len(dataframe), len(data_header)), dtype=np.float32)
+        row_count = 0
+
+        # aggregate all blunder-based features up front: explode the blunder
+        # lists into one long table (one row per blunder) and reduce it back to
+        # (game, player) with C-level groupbys, instead of re-scanning every
+        # game's blunder list in Python inside the loop
+        exploded = dataframe.Blunders.explode().dropna()
+        long_blunders = pd.DataFrame(exploded.tolist(), index=exploded.index,
+                                     columns=["MoveNum", "Player", "Move", "Ann", "EvalDiff"])
+        first = long_blunders.Move.str[0]
+        long_blunders["Piece"] = first.where(first.str.isupper(), "P").replace("O", "K")
+        eval_diff = long_blunders.EvalDiff.astype(float)
+
+        # (game, player) grid the aggregates get aligned on: white row first,
+        # black row second, matching the order rows are emitted below
+        full_index = pd.MultiIndex.from_product([dataframe.index, ["w", "b"]])
+
+        # blunder counts per game, player and weight bucket
+        buckets = pd.DataFrame({
+            "Blunder1": eval_diff <= 1,
+            "Blunder3": (eval_diff > 1) & (eval_diff <= 3),
+            "Blunder9": (eval_diff > 3) & (eval_diff <= 9),
+            "BlunderInf": (eval_diff > 9) & (eval_diff < np.inf),
+        }, index=long_blunders.index)
+        bucket_counts = (buckets.groupby([long_blunders.index, long_blunders.Player]).sum()
+                         .reindex(full_index, fill_value=0).to_numpy(dtype=float))
+
+        # blunder share per piece and player, blunders into mate are excluded
+        finite = long_blunders.loc[eval_diff.abs() < np.inf]
+        piece_counts = (finite.groupby([finite.index, "Player", "Piece"]).size()
+                        .unstack("Piece", fill_value=0)
+                        .reindex(columns=list("PNBRQK"), fill_value=0))
+        piece_prc = (piece_counts.div(piece_counts.sum(axis=1), axis=0)
+                     .reindex(full_index, fill_value=0).to_numpy(dtype=float))
+
+        # itertuples avoids building a Series per row, namedtuple attribute access is much cheaper
+        for game_num, row in enumerate(tqdm(dataframe.itertuples(index=False))):
+            blunders = row.Blunders
+
+            # check if match contains blunders, any() short-circuits instead of
+            # materializing the matches just to test for emptiness
+            if not any(x[1] == "w" and x[4] >= 1 for x in blunders):  # not enough white blunders
                 continue
-            if not list(filter(lambda x: x[1] == "b" and x[4] >= 1, row.Blunders)):  # not enough black blunders
+            if not any(x[1] == "b" and x[4] >= 1 for x in blunders):  # not enough black blunders
                 continue
 
             # we discovered a strange data
             gameplay = row.Gameplay
-            incomplete_data = False
-            for m in gameplay:
-                if len(m) < 2 and gameplay.index(m) + 1 != len(gameplay):
-                    incomplete_data = True
-                    break
+            last_move = len(gameplay) - 1
+            incomplete_data = any(len(m) < 2 and i != last_move for i, m in enumerate(gameplay))
             if incomplete_data:
                 continue
 
             white_elo = row.WhiteElo
             black_elo = row.BlackElo
-            game_length = len(row.Gameplay)
-
-            if game_length < 15:
-                continue
+            game_length = len(gameplay)
 
             termination = 0 if row.Termination == "Normal" else 1
-            remaining_pieces_white = row.Gameplay[-1][0][3]
-            remaining_pieces_black = row.Gameplay[-1][1][3] if len(row.Gameplay[-1]) == 2 else row.Gameplay[-2][1][3]
-            blunder1_white = len(list(filter(lambda x: x[1] == "w" and x[4] <= 1, row.Blunders))) / game_length
-            blunder3_white = len(list(filter(lambda x: x[1] == "w" and 1 < x[4] <= 3, row.Blunders))) / game_length
-            blunder9_white = len(list(filter(lambda x: x[1] == "w" and 3 < x[4] <= 9, row.Blunders))) / game_length
-            blunderInf_white = len(list(filter(lambda x: x[1] == "w" and 9 < x[4] < float("inf"), row.Blunders))) / game_length
-            blunder1_black = len(list(filter(lambda x: x[1] == "b" and x[4] <= 1, row.Blunders))) / game_length
-            blunder3_black = len(list(filter(lambda x: x[1] == "b" and 1 < x[4] <= 3, row.Blunders))) / game_length
-            blunder9_black = len(list(filter(lambda x: x[1] == "b" and 3 < x[4] <= 9, row.Blunders))) / game_length
-            blunderInf_black = len(list(filter(lambda x: x[1] == "b" and 9 < x[4] < float("inf"), row.Blunders))) / game_length
-            blunders_prc_p_white = self.blunder_percentage_piece(row.Blunders, "P", "w")
-            blunders_prc_n_white = self.blunder_percentage_piece(row.Blunders, "N", "w")
-            blunders_prc_b_white = self.blunder_percentage_piece(row.Blunders, "B", "w")
-            blunders_prc_r_white = self.blunder_percentage_piece(row.Blunders, "R", "w")
-            blunders_prc_q_white = self.blunder_percentage_piece(row.Blunders, "Q", "w")
-            blunders_prc_k_white = self.blunder_percentage_piece(row.Blunders, "K", "w")
-            blunders_prc_p_black = self.blunder_percentage_piece(row.Blunders, "P", "b")
-            blunders_prc_n_black = self.blunder_percentage_piece(row.Blunders, "N", "b")
-            blunders_prc_b_black = self.blunder_percentage_piece(row.Blunders, "B", "b")
-            blunders_prc_r_black = self.blunder_percentage_piece(row.Blunders, "R", "b")
-            blunders_prc_q_black = self.blunder_percentage_piece(row.Blunders, "Q", "b")
-            blunders_prc_k_black = self.blunder_percentage_piece(row.Blunders, "K", "b")
+            remaining_pieces_white = gameplay[-1][0][3]
+            remaining_pieces_black = gameplay[-1][1][3] if len(gameplay[-1]) == 2 else gameplay[-2][1][3]
+            # read the precomputed (game, player) aggregates, white and black
+            # occupy two adjacent rows per game
+            white_pos = 2 * game_num
+            black_pos = white_pos + 1
+            blunder1_white, blunder3_white, blunder9_white, blunderInf_white = bucket_counts[white_pos] / game_length
+            blunder1_black, blunder3_black, blunder9_black, blunderInf_black = bucket_counts[black_pos] / game_length
+            blunders_prc_p_white, blunders_prc_n_white, blunders_prc_b_white, \
+                blunders_prc_r_white, blunders_prc_q_white, blunders_prc_k_white = piece_prc[white_pos]
+            blunders_prc_p_black, blunders_prc_n_black, blunders_prc_b_black, \
+                blunders_prc_r_black, blunders_prc_q_black, blunders_prc_k_black = piece_prc[black_pos]
             blunders_prc_weighted_white = blunders_prc_p_white + blunders_prc_n_white * 3 + blunders_prc_b_white * 3 + blunders_prc_r_white * 5 + blunders_prc_q_white * 9
             blunders_prc_weighted_black = blunders_prc_p_black + blunders_prc_n_black * 3 + blunders_prc_b_black * 3 + blunders_prc_r_black * 5 + blunders_prc_q_black * 9
-            moves_prc_p_white = self.moves_percentage_piece(row.Gameplay, "P", 0)
-            moves_prc_n_white = self.moves_percentage_piece(row.Gameplay, "N", 0)
-            moves_prc_b_white = self.moves_percentage_piece(row.Gameplay, "B", 0)
-            moves_prc_r_white = self.moves_percentage_piece(row.Gameplay, "R", 0)
-            moves_prc_q_white = self.moves_percentage_piece(row.Gameplay, "Q", 0)
-            moves_prc_k_white = self.moves_percentage_piece(row.Gameplay, "K", 0)
-            moves_prc_p_black = self.moves_percentage_piece(row.Gameplay, "P", 1)
-            moves_prc_n_black = self.moves_percentage_piece(row.Gameplay, "N", 1)
-            moves_prc_b_black = self.moves_percentage_piece(row.Gameplay, "B", 1)
-            moves_prc_r_black = self.moves_percentage_piece(row.Gameplay, "R", 1)
-            moves_prc_q_black = self.moves_percentage_piece(row.Gameplay, "Q", 1)
-            moves_prc_k_black = self.moves_percentage_piece(row.Gameplay, "K", 1)
+            move_prc = self._move_piece_percentages(gameplay)
+            moves_prc_p_white = move_prc[("w", "P")]
+            moves_prc_n_white = move_prc[("w", "N")]
+            moves_prc_b_white = move_prc[("w", "B")]
+            moves_prc_r_white = move_prc[("w", "R")]
+            moves_prc_q_white = move_prc[("w", "Q")]
+            moves_prc_k_white = move_prc[("w", "K")]
+            moves_prc_p_black = move_prc[("b", "P")]
+            moves_prc_n_black = move_prc[("b", "N")]
+            moves_prc_b_black = move_prc[("b", "B")]
+            moves_prc_r_black = move_prc[("b", "R")]
+            moves_prc_q_black = move_prc[("b", "Q")]
+            moves_prc_k_black = move_prc[("b", "K")]
             moves_prc_weighted_white = moves_prc_p_white + moves_prc_n_white * 3 + moves_prc_b_white * 3 + moves_prc_r_white * 5 + moves_prc_q_white * 9
             moves_prc_weighted_black = moves_prc_p_black + moves_prc_n_black * 3 + moves_prc_b_black * 3 + moves_prc_r_black * 5 + moves_prc_q_black * 9
-            avg_blunder_time_white = self.avg_blunder_time(row.Gameplay, row.Blunders, "w")
-            avg_blunder_time_black = self.avg_blunder_time(row.Gameplay, row.Blunders, "b")
+            avg_blunder_time_white = self.avg_blunder_time(gameplay, blunders, "w")
+            avg_blunder_time_black = self.avg_blunder_time(gameplay, blunders, "b")
 
-            data.append([0, white_elo, termination, game_length, remaining_pieces_white, blunder1_white, blunder3_white, blunder9_white,
+            rows[row_count] = (0, white_elo, termination, game_length, remaining_pieces_white, blunder1_white, blunder3_white, blunder9_white,
                        blunderInf_white, blunders_prc_p_white, blunders_prc_n_white, blunders_prc_b_white, blunders_prc_r_white, blunders_prc_q_white, blunders_prc_k_white, blunders_prc_weighted_white,
                        moves_prc_p_white, moves_prc_n_white, moves_prc_b_white, moves_prc_r_white, moves_prc_q_white, moves_prc_k_white, moves_prc_weighted_white,
-                       avg_blunder_time_white])
+                       avg_blunder_time_white)
 
-            data.append([1, black_elo, termination, game_length, remaining_pieces_black, blunder1_black, blunder3_black, blunder9_black,
+            rows[row_count + 1] = (1, black_elo, termination, game_length, remaining_pieces_black, blunder1_black, blunder3_black, blunder9_black,
                        blunderInf_black, blunders_prc_p_black, blunders_prc_n_black, blunders_prc_b_black,
                        blunders_prc_r_black, blunders_prc_q_black, blunders_prc_k_black, blunders_prc_weighted_black,
                        moves_prc_p_black, moves_prc_n_black, moves_prc_b_black, moves_prc_r_black, moves_prc_q_black,
                        moves_prc_k_black, moves_prc_weighted_black,
-                       avg_blunder_time_black])
+                       avg_blunder_time_black)
 
-        data_header = ["Color", "Elo", "Termination", "GameLength", "RemainingPieces", "Blunder1", "Blunder3",
-                     "Blunder9", "BlunderInf",
-                     "BlunderPercentagePawn", "BlunderPercentageKnight", "BlunderPercentageBishop",
-                     "BlunderPercentageRook", "BlunderPercentageQueen", "BlunderPercentageKing",
-                     "BlunderPercentageWeighted", "MovesPercentagePawn", "MovesPercentageKnight", "MovesPercentageBishop",
-                     "MovesPercentageRook", "MovesPercentageQueen", "MovesPercentageKing", "MovesPercentageWeighted",
-                     "AvgBlunderTime"]
-        # return df with all elos
-        all_elos = pd.DataFrame.from_records(data, columns=data_header)
-
-        return all_elos
+            row_count += 2
 
-    def blunder_percentage_piece(self, blunders, piece, player):
-        """
-        Calculates the percentage a given player blunders with the given piece.
+        # return df with all elos, skipped games leave the tail of the
+        # preallocated matrix unused
+        all_elos = pd.DataFrame(rows[:row_count], columns=data_header)
 
-        Parameters
-        ----------
-        blunders : list
-            List containing all blunders of match.
-
-        piece : char
-            Chess piece \in {P, N, B, R, Q, K}
-
-        player : char
-            Player \in {w, b}
+        return all_elos
 
-        Return
-        ------
-        float : float [0,1]
-            percentage
-        """
-        blunders = list(filter(lambda x: x[1] == player and abs(x[4]) < float("inf"), blunders))
-        blunders_total = len(blunders)
-        if blunders_total == 0:
-            return 0
-        if piece == "P":
-            return len(list(filter(lambda x: x[2][0].islower() and x[1] == player, blunders))) / blunders_total
-        if piece == "K":
-            return len(list(filter(lambda x: (x[2][0] == piece or x[2][0] == "O") and x[1] == player,
-                                   blunders))) / blunders_total
-        return len(list(filter(lambda x: x[2][0] == piece and x[1] == player, blunders))) / blunders_total
-
-    def moves_percentage_piece(self, game, piece, player):
+    @staticmethod
+    def _move_piece_percentages(game):
         """
-        Calculates the percentage a given player moves with the given piece.
+        Calculates the percentage both players move with each piece in a single pass.
 
         Parameters
         ----------
         game : list
             List containing all moves of the match.
 
-        piece : char
-            Chess piece \in {P, N, B, R, Q, K}
-
-        player : char
-            Player \in {w, b}
-
         Return
         ------
-        float : float [0,1]
-            percentage
+        percentages : dict
+            Maps (player, piece) to the share of the player's moves made
+            with that piece.
         """
-        if player == 1 and len(game[-1]) < 2:
-            moves_total = len(game) - 1
-            gameplay = game[:-1]
-        else:
-            moves_total = len(game)
-            gameplay = game
-        if piece == "P":
-            return len(list(filter(lambda x: x[player][0][0].islower(), gameplay))) / moves_total
-        if piece == "K":
-            return len(list(filter(lambda x: x[player][0][0] == piece or x[player][0][0] == "O", gameplay))) / moves_total
-
-        return len(list(filter(lambda x: x[player][0][0] == piece, gameplay))) / moves_total
+        counts = {(player, piece): 0 for player in "wb" for piece in "PNBRQK"}
+        totals = {"w": len(game), "b": len(game)}
+        if game and len(game[-1]) < 2:  # last move only contains a white half-move
+            totals["b"] -= 1
+        for move in game:
+            for player, half_move in zip("wb", move):
+                first = half_move[0][0]
+                if first.islower():
+                    piece = "P"
+                elif first == "O":  # castling counts as a king move
+                    piece = "K"
+                else:
+                    piece = first
+                counts[(player, piece)] += 1
+
+        return {key: count / totals[key[0]] if totals[key[0]] else 0 for key, count in counts.items()}
 
     def avg_blunder_time(self, gameplay, blunders, player):
         """
@@ -360,12 +361,10 @@ class Evaluation:
         ------
         float : float [1,16]
         """
-        blunders = list(filter(lambda x: x[1] == player and 1 <= abs(x[4]) < float("inf"), blunders))
-        blunders_total = len(blunders)
-        sum_remaining_pieces = 0
-        player_id = 0 if player == "w" else 0
-        for blunder in blunders:
-            move = blunder[0] - 1
-            sum_remaining_pieces += gameplay[move][player_id][3]
-
-        return sum_remaining_pieces / blunders_total
+        blunders = [x for x in blunders if x[1] == player and 1 <= abs(x[4]) < float("inf")]
+        if not blunders:
+            return 0
+        player_id = 0 if player == "w" else 1
+        remaining_pieces = np.fromiter((gameplay[blunder[0] - 1][player_id][3] for blunder in blunders),
+                                       dtype=np.int8, count=len(blunders))
+        return remaining_pieces.mean()
@@ -4,7 +4,6 @@ from pre_processing import PreProcessing
 from evaluation import Evaluation
 from regression import Regression
 from visualization import Visualization
-import _pickle as cPickle
 import gc
 
 
@@ -15,7 +14,9 @@ def create_csv_pkl():
 
     # Load January 2015
     DataLoader.create_csv(path_databases="data", databases=["lichess_db_standard_rated_2015-1.pgn"], path_csv="data", name_csv="2015-1.csv", stockfish_analysis=True)
-    dataframe = pd.read_csv("data/2015-1.csv")
+    # the pyarrow engine parses the csv multithreaded and keeps the long
+    # gameplay strings in arrow buffers instead of python objects
+    dataframe = pd.read_csv("data/2015-1.csv", engine="pyarrow", dtype_backend="pyarrow")
     PreProcessing.convert_df(dataframe)
     PreProcessing.preprocess_gameplay(dataframe)
     print("preprocessing done")
@@ -25,7 +26,7 @@ def create_csv_pkl():
 
     # Load February 2015
     DataLoader.create_csv(path_databases="data", databases=["lichess_db_standard_rated_2015-2.pgn"], path_csv="data", name_csv="2015-2.csv", stockfish_analysis=True)
-    dataframe = pd.read_csv("data/2015-2.csv")
+    dataframe = pd.read_csv("data/2015-2.csv", engine="pyarrow", dtype_backend="pyarrow")
     PreProcessing.convert_df(dataframe)
     PreProcessing.preprocess_gameplay(dataframe)
     print("preprocessing done")
@@ -48,13 +49,12 @@ def read_pkl(pkl_list):
         pandas dataframe
     """
 
-    # read files much faster with cPickle and disabled garbage collection, python pickle is infeasible slow
+    # disabled garbage collection makes unpickling the millions of small move
+    # lists much faster; pd.read_pickle uses the C pickle implementation
     data = []
     gc.disable()
     for pkl in pkl_list:
-        output = open(pkl, "r+b")
-        data.append(cPickle.load(output))
-        output.close()
+        data.append(pd.read_pickle(pkl))
         print("loaded ", pkl)
 
     # concat files
@@ -1,7 +1,43 @@
+import functools
 import re
+import numpy as np
 import pandas as pd
 
 
+# precompiled patterns for convert_gameplay, recompiling them per game is wasted work
+# one half-move chunk: the move marker ("1. " for white, "1... " for black)
+# followed by everything up to the next marker or the end of the game
+_TOKEN = re.compile(r'\d+\.(?P<cont>\.\.)?\s(?P<body>.*?)(?=\s\d+\.(?:\.\.)?\s|$)', re.S)
+_EVAL_RE = re.compile(r'#-?\d+|-?\d+\.\d+')  # engine evaluation, eg "-0.5" or "#3"
+_ANN_RE = re.compile(r'[!?]+')  # annotation symbols, eg "??" or "?!"
+_MOVE_RE = re.compile(r'[\w\-]+')  # the characters that make up the bare move
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_game(gameplay_str):
+    """
+    Parses one raw gameplay string into its gameplay and blunder lists.
+
+    Memoized because the database dumps contain many exact duplicate games,
+    short ones especially; duplicates are parsed once and the rows share the
+    resulting lists, which no later stage mutates. The unbounded cache keeps
+    one entry per distinct game and is traded for the repeated parsing work.
+
+    Parameters
+    ----------
+    gameplay_str : str
+        string of a chess game
+
+    Return
+    ------
+    (gameplay_list, blunder_list) : (list, list)
+        parsed moves including remaining pieces, and the extracted blunders
+    """
+
+    gameplay = PreProcessing.add_remaining_pieces(PreProcessing.convert_gameplay(gameplay_str))
+    return gameplay, PreProcessing.find_blunder(gameplay)
+
+
 class PreProcessing:
     """
     Pre processing module to convert gameplay data into a list and extract blunders
@@ -25,23 +61,22 @@ class PreProcessing:
             [[move_white, engine_evaluation, interpretation],[move_black, engine_evaluation, interpretation]]
         """
 
-        gameplay_list = re.split('\d+\.\s', gameplay_str)[1:]  # separate the moves by "[number].", eg "1.", "22.", etc.
-        for i, full_move in enumerate(gameplay_list):
-            # split into white/black moves by the indicator for the second half-move "[number]...", eg. "1..."
-            gameplay_list[i] = re.split('\s\d+\.\.\.\s', full_move)  
-            for j, half_move in enumerate(gameplay_list[i]):
-                # after the actual move (e.g. Qxe5) there a " " before the evaluation
-                gameplay_list[i][j] = [half_move.split(" ")[0]]
-                if re.findall('#\-?\d+|\-?\d+\.\d+', half_move):  # catch last moves before mate
-                    gameplay_list[i][j].append(re.findall('#\-?\d+|\-?\d+\.\d+', half_move)[0])
-                else:
-                    gameplay_list[i][j].append("")
-                ann = list(filter(None, re.findall('[!|?]*', gameplay_list[i][j][0])))
-                if ann:  # find annotation symbols
-                    gameplay_list[i][j].append(ann[0])
-                else:
-                    gameplay_list[i][j].append("")
-                gameplay_list[i][j][0] = "".join(re.findall('\w|\-', gameplay_list[i][j][0]))  # remove annotation symbols from move
+        gameplay_list = []
+        # a single tokenizer pass over the game replaces the old nested
+        # re.split calls and their intermediate string lists
+        for token in _TOKEN.finditer(gameplay_str):
+            body = token.group("body")
+            # after the actual move (e.g. Qxe5) there a " " before the evaluation
+            move = body.split(" ")[0]
+            evaluation = _EVAL_RE.search(body)  # also catches last moves before mate
+            ann = _ANN_RE.search(move)  # find annotation symbols
+            entry = ["".join(_MOVE_RE.findall(move)),  # remove annotation symbols from move
+                     evaluation.group(0) if evaluation else "",
+                     ann.group(0) if ann else ""]
+            if token.group("cont") and gameplay_list:  # black's half of the current move
+                gameplay_list[-1].append(entry)
+            else:
+                gameplay_list.append([entry])
 
         return gameplay_list
 
@@ -56,9 +91,17 @@ class PreProcessing:
             pandas dataframe
         """
 
-        df.Gameplay = df.Gameplay.apply(PreProcessing.convert_gameplay)
-        df.Gameplay = df.Gameplay.apply(PreProcessing.add_remaining_pieces)
-        df["Blunders"] = df.Gameplay.apply(PreProcessing.find_blunder)
+        # run the whole pipeline in one traversal of the raw strings instead of
+        # three Series.apply passes, which saves two intermediate Series and
+        # the per-pass apply dispatch; _parse_game memoizes duplicate games
+        gameplays = []
+        blunders = []
+        for gameplay_str in df.Gameplay.to_numpy():
+            gameplay, game_blunders = _parse_game(gameplay_str)
+            gameplays.append(gameplay)
+            blunders.append(game_blunders)
+        df["Gameplay"] = gameplays
+        df["Blunders"] = blunders
 
     @staticmethod
     def convert_df(df):
@@ -71,23 +114,41 @@ class PreProcessing:
             pandas dataframe
         """
 
-        # convert time
+        # keep the big string columns in arrow buffers, roughly half the
+        # memory of python str objects; a no-op when the frame was already
+        # read with dtype_backend="pyarrow"
+        for column in ("Gameplay", "UTCDate", "UTCTime"):
+            df[column] = df[column].astype("string[pyarrow]")
+
+        # convert time, cache=True dedupes the many repeated timestamp strings
         df.insert(7, "UTCDateTime", df["UTCDate"] + "-" + df["UTCTime"])
-        df.UTCDateTime = pd.to_datetime(df.UTCDateTime, format="%Y.%m.%d-%H:%M:%S")
+        df.UTCDateTime = pd.to_datetime(df.UTCDateTime, format="%Y.%m.%d-%H:%M:%S", cache=True)
         df.drop(["Site", "Date", "Round", "UTCDate", "UTCTime"], axis=1, inplace=True)
 
-        # delete anonymous games 
-        df.drop(df.loc[df["WhiteElo"] == "?"].index, inplace=True)
-        df.drop(df.loc[df["BlackElo"] == "?"].index, inplace=True)
-
-        # set datatype of ELO to integer
-        df.WhiteElo = df.WhiteElo.astype(int)
-        df.BlackElo = df.BlackElo.astype(int)
-
-        # replace result with more meaningful values
-        df.Result.replace(to_replace="1-0", value="w", inplace=True)
-        df.Result.replace(to_replace="0-1", value="b", inplace=True)
-        df.Result.replace(to_replace="1/2-1/2", value="d", inplace=True)
+        # delete anonymous games with one combined mask and a single reindex
+        # instead of two separate index builds and drops
+        anonymous = (df["WhiteElo"] == "?") | (df["BlackElo"] == "?")
+        df.drop(df.index[anonymous], inplace=True)
+
+        # set datatype of ELO to a narrow integer, ratings fit easily into int16
+        df.WhiteElo = df.WhiteElo.astype("int16")
+        df.BlackElo = df.BlackElo.astype("int16")
+        # the rating diffs can be missing, so they need a nullable integer type
+        df.WhiteRatingDiff = pd.to_numeric(df.WhiteRatingDiff, errors="coerce").astype("Int16")
+        df.BlackRatingDiff = pd.to_numeric(df.BlackRatingDiff, errors="coerce").astype("Int16")
+
+        # replace result with more meaningful values, a single map scans the
+        # column once instead of three replace passes
+        df["Result"] = df["Result"].map({"1-0": "w", "0-1": "b", "1/2-1/2": "d"})
+
+        # these columns have very few distinct values, storing them as
+        # categoricals shrinks the frame considerably and speeds up later masks;
+        # the pyarrow read infers all-empty columns (usually the titles) as
+        # null-typed, which cannot be categorized directly, so coerce through
+        # a string dtype first
+        for column in ("Event", "Result", "ECO", "Opening", "TimeControl",
+                       "Termination", "WhiteTitle", "BlackTitle"):
+            df[column] = df[column].astype("string[pyarrow]").astype("category")
 
     @staticmethod
     def find_blunder(gameplay_list):
@@ -106,37 +167,89 @@ class PreProcessing:
             list of blunders of a chess match
         """
 
-        blunders = []
-        eval_b_before = 0
-        for i, move in enumerate(gameplay_list):
+        # unpack the nested per-move lists into flat per-column lists
+        # (structure-of-arrays), all parsing then happens in bulk below
+        ann_codes = PreProcessing._ANN_CODES
+        moves_w, moves_b = [], []
+        raws_w, raws_b = [], []
+        anns_w, anns_b = [], []
+        for move in gameplay_list:
             if len(move) < 2:
                 break
             [move_w, eval_w, ann_w, _], [move_b, eval_b, ann_b, _] = move
+            moves_w.append(move_w)
+            moves_b.append(move_b)
+            raws_w.append(eval_w)
+            raws_b.append(eval_b)
+            anns_w.append(ann_codes.get(ann_w, 0))
+            anns_b.append(ann_codes.get(ann_b, 0))
+
+        num_moves = len(raws_w)
+        if not num_moves:
+            return []
+
+        # a mate for white ("-#...") is -inf from white's and +inf from
+        # black's point of view, and vice versa
+        evals_w = PreProcessing._parse_evals(raws_w, float("-inf"))
+        evals_b = PreProcessing._parse_evals(raws_b, float("inf"))
+        # an empty black evaluation inherits white's, as before
+        missing_b = np.fromiter((not raw for raw in raws_b), dtype=bool, count=num_moves)
+        evals_b[missing_b] = evals_w[missing_b]
+
+        # black's evaluation of the previous move, 0 before the first move
+        evals_b_before = np.empty(num_moves)
+        evals_b_before[0] = 0.0
+        evals_b_before[1:] = evals_b[:-1]
+        diffs_w = evals_b_before - evals_w
+        diffs_b = evals_b - evals_w
+
+        # only the few annotated moves are touched in Python
+        ann_w = np.fromiter(anns_w, dtype=np.int8, count=num_moves)
+        ann_b = np.fromiter(anns_b, dtype=np.int8, count=num_moves)
+        symbols = PreProcessing._ANN_SYMBOLS
+        blunders = []
+        for i in np.nonzero(ann_w | ann_b)[0]:
+            i = int(i)
+            if ann_w[i]:
+                blunders.append([i + 1, "w", moves_w[i], symbols[ann_w[i]], float(diffs_w[i])])
+            if ann_b[i]:
+                blunders.append([i + 1, "b", moves_b[i], symbols[ann_b[i]], float(diffs_b[i])])
 
-            if "-#" in eval_w:
-                eval_w = float("-inf")
-            elif "#" in eval_w:
-                eval_w = float("inf")
-            elif eval_w:
-                eval_w = float(eval_w)
-
-            if "-#" in eval_b:
-                eval_b = float("inf")
-            elif "#" in eval_b:
-                eval_b = float("-inf")
-            elif eval_b:
-                eval_b = float(eval_b)
-            else:
-                eval_b = eval_w
+        return blunders
 
-            if ann_w == "?" or ann_w == "??" or ann_w == "?!":
-                blunders.append([i+1, "w", move_w, ann_w, eval_b_before - eval_w])
-            if ann_b == "?" or ann_b == "??" or ann_b == "?!":
-                blunders.append([i + 1, "b", move_b, ann_b, - (eval_w - eval_b)])
+    # integer codes for the annotation symbols that mark a mistake, so the
+    # blunder extraction can test a single int instead of three string comparisons
+    _ANN_CODES = {"?": 1, "??": 2, "?!": 3}
+    _ANN_SYMBOLS = ("", "?", "??", "?!")
 
-            eval_b_before = eval_b
+    @staticmethod
+    def _parse_evals(raw_evals, neg_mate_value):
+        """
+        Converts the evaluation strings of one player's whole game to floats in bulk
 
-        return blunders
+        Parameters
+        ----------
+        raw_evals : list
+            evaluation strings of one player for a whole game
+        neg_mate_value : float
+            value assigned to a "-#..." mate score, +-inf depending on
+            whose column is parsed
+
+        Return
+        ------
+        evals : ndarray
+            float evaluations, mates as +-inf, missing evaluations as nan
+        """
+
+        raw = np.array(raw_evals)
+        mate_neg = np.char.find(raw, "-#") >= 0
+        mate_pos = (np.char.find(raw, "#") >= 0) & ~mate_neg
+        evals = np.full(len(raw), np.nan)
+        plain = ~mate_neg & ~mate_pos & (raw != "")
+        evals[plain] = raw[plain].astype(np.float64)
+        evals[mate_neg] = neg_mate_value
+        evals[mate_pos] = -neg_mate_value
+        return evals
 
     @staticmethod
     def add_remaining_pieces(gameplay_list):
@@ -154,36 +267,31 @@ class PreProcessing:
             list of moves in a chess match, including the remaining pieces of the players
         """
 
-        # both players start with 16 pieces on the board
-        num_white_pieces = 16
-        num_black_pieces = 16
-
-        # we want to add number of remaining pieces to all moves
-        modified_gameplay_list = gameplay_list
-
-        for i, move in enumerate(gameplay_list):
-            # moves, where both black and white did a move
+        if not gameplay_list:
+            return gameplay_list
+
+        # an "x" in the move string means a piece was captured, find all
+        # captures with two C-level passes instead of a Python test per move;
+        # a move without a black half (mostly the last move of game) counts
+        # as a non-capturing black move here
+        moves_w = np.array([move[0][0] for move in gameplay_list])
+        moves_b = np.array([move[1][0] if len(move) == 2 else "" for move in gameplay_list])
+        captures_w = np.char.find(moves_w, "x") >= 0
+        captures_b = np.char.find(moves_b, "x") >= 0
+
+        # both players start with 16 pieces on the board; white's count is
+        # taken before, black's count after white's capture of the move
+        pieces_b = 16 - np.cumsum(captures_w)
+        pieces_w = np.empty(len(gameplay_list), dtype=np.int64)
+        pieces_w[0] = 16
+        pieces_w[1:] = 16 - np.cumsum(captures_b)[:-1]
+
+        for move, num_white_pieces, num_black_pieces in zip(gameplay_list, pieces_w, pieces_b):
+            move[0].append(int(num_white_pieces))
             if len(move) == 2:
-                white_move, black_move = move
-                # if there is an "x" in the move string, this means a piece was captured,
-                # so we reduce the current number of pieces of the player
-
-                if "x" in white_move[0]:
-                    num_black_pieces -= 1
-                if "x" in black_move[0]:
-                    num_white_pieces -= 1
+                move[1].append(int(num_black_pieces))
 
-                modified_gameplay_list[i][1].append(num_black_pieces)
-            else: # move, where only white did a move (mostly the last move of game)
-                if "x" in move[0][0]:  
-                    num_black_pieces -= 1
-
-            if len(gameplay_list) >= i + 2:
-                modified_gameplay_list[i+1][0].append(num_white_pieces)
-
-        modified_gameplay_list[0][0].append(16)  # add initial value for white
-
-        return modified_gameplay_list
+        return gameplay_list
 
 
 
@@ -32,6 +32,7 @@ class Regression:
         self.labels = labels
         self.dep_val = dep_val
         self.x_ = np.arange(len(labels))
+        self._splits = {}
 
     def plot_correlations(self):
         """
@@ -45,27 +46,70 @@ class Regression:
         plt.rcParams.update(figsizes.neurips2021(nrows=math.ceil(len(self.labels) / cols), ncols=cols, constrained_layout=True, tight_layout=False, height_to_width_ratio=1.0))
         plt.rc('text.latex', preamble=r'\usepackage{skak} \usepackage{times}')
 
+        # one closed-form solve replaces the per-label sklearn fits: for a
+        # single feature the least-squares slope is just cov(x, y) / var(x),
+        # so all slopes and intercepts come out of two numpy reductions
+        features = self.df[self.labels].values.astype(np.float64)
+        elo = self.dependent_values.astype(np.float64)
+        feature_means = features.mean(axis=0)
+        centered = features - feature_means
+        slopes = (centered * (elo - elo.mean())[:, None]).sum(axis=0) / (centered ** 2).sum(axis=0)
+        intercepts = elo.mean() - slopes * feature_means
+
         fig, ax = plt.subplots(nrows=math.ceil(len(self.labels) / cols), ncols=cols, sharey=True)
         for i, l in enumerate(self.labels):  # use just for specific labels
-            X = self.df[l].values
+            X = features[:, i]
             x_ = np.linspace(X.min(), X.max(), 100 + 1)
-            y = self.dependent_values
-            reg = LinearRegression(fit_intercept=True).fit(X.reshape(-1, 1), y)
-            y_pred_sklearn = reg.predict(x_.reshape(-1, 1))
+            y_pred = slopes[i] * x_ + intercepts[i]
+            # bind the subplot once instead of recomputing the grid position
+            # for every call on it
+            row, col = divmod(i, cols)
+            subplot = ax[row, col]
 
             # Feature Game Length should not have percentage in x-axis
             if not "GameLength" in l:
-                ax[math.floor(i / cols), i % cols].xaxis.set_major_formatter(mtick.PercentFormatter(1))
-                ax[math.floor(i / cols), i % cols].yaxis.set_major_formatter(mtick.StrMethodFormatter("{x:.0f}"))
+                subplot.xaxis.set_major_formatter(mtick.PercentFormatter(1))
+                subplot.yaxis.set_major_formatter(mtick.StrMethodFormatter("{x:.0f}"))
             else:
-                ax[math.floor(i / cols), i % cols].xaxis.set_major_formatter(mtick.StrMethodFormatter("{x:.0f}"))
-            ax[math.floor(i / cols), i % cols].plot(x_, y_pred_sklearn, color='red', alpha=0.7)
-            ax[math.floor(i / cols), i % cols].scatter(self.df[l].values, self.df[self.dep_val].values, linewidth=0, alpha=0.1, s=1, rasterized=True)
-            ax[math.floor(i / cols), i % cols].set_title(titles[i])  # use just for specific labels
-            ax[math.floor(i / cols), i % cols].set_ylabel("Elo")
+                subplot.xaxis.set_major_formatter(mtick.StrMethodFormatter("{x:.0f}"))
+            subplot.plot(x_, y_pred, color='red', alpha=0.7)
+            # a hexbin density needs O(gridsize^2) patches instead of one
+            # path per game, which renders much faster and keeps the pdf small
+            subplot.hexbin(X, elo, gridsize=60, cmap='Blues', mincnt=1, rasterized=True)
+            subplot.set_title(titles[i])  # use just for specific labels
+            subplot.set_ylabel("Elo")
         plt.show()
         fig.savefig("plots/correlations.pdf")
 
+    def _standardized_split(self, test_size):
+        """
+        Splits the data and standardizes it with the training set statistics.
+
+        Fitting the scaler on the training split only does half the scaler
+        work and keeps test statistics out of the model; the prepared split
+        is cached per test_size so repeated plots don't recompute it.
+
+        Parameters
+        ----------
+        test_size : float [0,1]
+            Ratio of the test-train size for the linear regression
+
+        Return
+        ------
+        split : tuple
+            (independent_train, independent_test, dependent_train, dependent_test)
+        """
+
+        if test_size not in self._splits:
+            independent_train, independent_test, dependent_train, dependent_test = train_test_split(
+                self.independent_values, self.dependent_values.reshape(-1, 1), test_size=test_size, random_state=42)
+            # the split arrays are already copies, so the scaler can standardize
+            # them in place
+            scaler = preprocessing.StandardScaler(copy=False).fit(independent_train)
+            self._splits[test_size] = (scaler.transform(independent_train), scaler.transform(independent_test),
+                                       dependent_train, dependent_test)
+        return self._splits[test_size]
+
     def plot_linear_regression(self, test_size):
         """
         Performs linear regression and generates the corresponding plot.
@@ -76,10 +120,7 @@ class Regression:
             Ratio of the test-train size for the linear regression
         """
 
-        # Standardize Data
-        indep_val_standardized = preprocessing.StandardScaler().fit_transform(self.independent_values)
-        # split data into training and testing sets
-        independent_train, independent_test, dependent_train, dependent_test = train_test_split(indep_val_standardized, self.dependent_values.reshape(-1, 1), test_size=test_size, random_state=42)
+        independent_train, independent_test, dependent_train, dependent_test = self._standardized_split(test_size)
         lin_reg = LinearRegression().fit(independent_train, dependent_train)
         test_pred = lin_reg.predict(independent_test)
         mean_squared_loss = mean_squared_error(dependent_test, test_pred)
@@ -91,6 +132,11 @@ class Regression:
         plt.rcParams.update(bundles.neurips2021())
         plt.rcParams.update(figsizes.neurips2021(nrows=1, ncols=1, constrained_layout=True, tight_layout=False, height_to_width_ratio=0.5))
         fig, ax = plt.subplots(nrows=1, ncols=1)
+        # the plot does not get denser beyond a few thousand points, so a
+        # fixed-seed subsample caps the scatter cost on big test sets
+        if len(dependent_test) > 20000:
+            idx = np.random.default_rng(0).choice(len(dependent_test), 20000, replace=False)
+            dependent_test, test_pred = dependent_test[idx], test_pred[idx]
         ax.scatter(dependent_test, test_pred, alpha=0.5, linewidth=0, s=1, rasterized=True)
         ax.plot([0, 1], [0, 1], transform=ax.transAxes, ls="--", c="red", alpha=0.7)
         ax.set_xlim([800, 2600])
@@ -1,9 +1,112 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
 import matplotlib.pyplot as plt
 import numpy as np
 from tueplots import bundles
 from tueplots import figsizes
 import matplotlib.ticker as mtick
-from evaluation import Evaluation
+
+
+def _aggregate_boxplot_range(blunders_dict, moves_dict, elo_range):
+    """
+    Aggregates the violin-plot data of one Elo range.
+
+    Module-level function so it can run in a worker process,
+    see Visualization.plot_blunder_boxplot.
+
+    Parameters
+    ----------
+    blunders_dict : dict
+        nested per-Elo blunder dictionary, see plot_blunder_boxplot
+    moves_dict : dict
+        nested per-Elo move dictionary, see plot_blunder_boxplot
+    elo_range : (Int, Int)
+        Elo range to aggregate
+
+    Return
+    ------
+    (blunder_diffs, total_blunders, total_moves) : (list, ndarray, ndarray)
+        eval diffs per piece plus blunder and move totals per piece
+    """
+
+    blunders_elo = Visualization._merge_elo_range(blunders_dict, elo_range)
+    moves_elo = Visualization._merge_elo_range(moves_dict, elo_range)
+
+    # extract the eval diffs per piece into numpy arrays in one pass,
+    # violinplot converts its input to arrays anyway; the move lists
+    # are only needed for their lengths
+    blunder_diffs = [np.fromiter((blunder[1] for blunder in blunders_elo[piece]),
+                                 dtype=np.float32, count=len(blunders_elo[piece]))
+                     for piece in "PNBRQK"]
+    total_blunders = np.array([len(diffs) for diffs in blunder_diffs])
+    total_moves = np.array([len(moves_elo[piece]) for piece in "PNBRQK"])
+    return blunder_diffs, total_blunders, total_moves
+
+
+def _aggregate_heatmap_range(blunders_dict, moves_dict, elo_range):
+    """
+    Aggregates the per-square counters of one Elo range.
+
+    Module-level function so it can run in a worker process,
+    see Visualization.plot_blunder_heatmap.
+
+    Parameters
+    ----------
+    blunders_dict : dict
+        nested per-Elo blunder dictionary, see plot_blunder_heatmap
+    moves_dict : dict
+        nested per-Elo move dictionary, see plot_blunder_heatmap
+    elo_range : (Int, Int)
+        Elo range to aggregate
+
+    Return
+    ------
+    (num_blunders, weighted_blunders, num_moves) : (ndarray, ndarray, ndarray)
+        blunder count, eval-diff sum and move count per board square
+    """
+
+    num_squares = 64
+    num_blunders = np.zeros(num_squares)
+    weighted_blunders = np.zeros(num_squares)
+    num_moves = np.zeros(num_squares)
+
+    # combine all blunders for given elo range
+    blunders_elo = Visualization._merge_elo_range(blunders_dict, elo_range)
+    moves_elo = Visualization._merge_elo_range(moves_dict, elo_range)
+
+    # fill array for heatmap with blunders, based on the square the blunder
+    # happened on; the entries already carry board indices (castling is
+    # resolved at encode time, see Evaluation._classify_move), so the
+    # indices of all pieces are concatenated and each counter is filled
+    # by a single bincount histogram pass
+    blunder_idx = []
+    blunder_eval_diffs = []
+    for piece in blunders_elo:
+        blunders = blunders_elo[piece]
+        if not blunders:
+            continue
+        blunder_idx.append(np.fromiter((blunder[0] for blunder in blunders),
+                                       dtype=np.intp, count=len(blunders)))
+        blunder_eval_diffs.append(np.fromiter((blunder[1] for blunder in blunders),
+                                              dtype=np.float64, count=len(blunders)))
+    if blunder_idx:
+        idx = np.concatenate(blunder_idx)
+        num_blunders += np.bincount(idx, minlength=num_squares)
+        weighted_blunders += np.bincount(idx, weights=np.concatenate(blunder_eval_diffs),
+                                         minlength=num_squares)
+
+    # fill array for heatmap with moves, based on the square the blunder happened on
+    move_idx = []
+    for piece in moves_elo:
+        moves = moves_elo[piece]
+        if not moves:
+            continue
+        move_idx.append(np.fromiter((move[0] for move in moves),
+                                    dtype=np.intp, count=len(moves)))
+    if move_idx:
+        num_moves += np.bincount(np.concatenate(move_idx), minlength=num_squares)
+
+    return num_blunders, weighted_blunders, num_moves
 
 
 class Visualization:
@@ -11,6 +114,31 @@ class Visualization:
     Visualization module to create violin plot and heatmap
     """
 
+    @staticmethod
+    def _merge_elo_range(nested_dict, elo_range):
+        """
+        Flattens the per-100-Elo buckets of one Elo range into a single dict
+
+        Parameters
+        ----------
+        nested_dict : dict
+            Nested dictionary, where Elos are main keys. Per Elo, the value is
+            a second dictionary containing lists per chess piece
+        elo_range : (Int, Int)
+            Elo range to combine
+
+        Return
+        ------
+        merged : dict
+            dictionary with one flat list per chess piece covering the whole Elo range
+        """
+
+        # one chain per piece instead of repeatedly concatenating
+        # ever-growing lists bucket by bucket
+        buckets = [nested_dict[elo] for elo in range(elo_range[0], elo_range[1], 100)]
+        return {piece: list(chain.from_iterable(bucket[piece] for bucket in buckets))
+                for piece in buckets[0]}
+
     @staticmethod
     def plot_blunder_boxplot(blunders_dict, moves_dict, elos):
         """
@@ -37,35 +165,18 @@ class Visualization:
 
         fig, axes = plt.subplots(2, 2)
 
+        # the Elo ranges are aggregated independently in worker processes,
+        # only the single-threaded matplotlib drawing stays on the main thread
+        with ProcessPoolExecutor(max_workers=len(elos)) as executor:
+            aggregates = list(executor.map(_aggregate_boxplot_range,
+                                           [blunders_dict] * len(elos),
+                                           [moves_dict] * len(elos), elos))
+
         for i, ax in enumerate(axes.flat):
             elo_range = elos[i]
-
-            blunders_elo = blunders_dict[elo_range[0]]
-            moves_elo = moves_dict[elo_range[0]]
-
-            for elo in range(elo_range[0] + 100, elo_range[1], 100):
-                blunders_elo = Evaluation.merge_dicts_of_lists(blunders_elo, blunders_dict[elo])
-                moves_elo = Evaluation.merge_dicts_of_lists(moves_elo, moves_dict[elo])
-
-            blunders_p = [x[1] for x in blunders_elo["P"]]
-            blunders_n = [x[1] for x in blunders_elo["N"]]
-            blunders_b = [x[1] for x in blunders_elo["B"]]
-            blunders_r = [x[1] for x in blunders_elo["R"]]
-            blunders_q = [x[1] for x in blunders_elo["Q"]]
-            blunders_k = [x[1] for x in blunders_elo["K"]]
-
-            moves_p = [x[1] for x in moves_elo["P"]]
-            moves_n = [x[1] for x in moves_elo["N"]]
-            moves_b = [x[1] for x in moves_elo["B"]]
-            moves_r = [x[1] for x in moves_elo["R"]]
-            moves_q = [x[1] for x in moves_elo["Q"]]
-            moves_k = [x[1] for x in moves_elo["K"]]
-
-            total_blunders = np.array(
-                [len(blunders_p), len(blunders_n), len(blunders_b), len(blunders_r), len(blunders_q), len(blunders_k)])
-            total_moves = np.array([len(moves_p), len(moves_n), len(moves_b), len(moves_r), len(moves_q), len(moves_k)])
+            blunder_diffs, total_blunders, total_moves = aggregates[i]
             ax2 = ax.twinx()
-            ax.violinplot([blunders_p, blunders_n, blunders_b, blunders_r, blunders_q, blunders_k], showmedians=True)
+            ax.violinplot(blunder_diffs, showmedians=True)
             # blunder perc
             letter = chr(i + 97)
             ax2.bar(range(1, 7), total_blunders / total_moves, alpha=0.2)
@@ -109,54 +220,27 @@ class Visualization:
 
         fig, axes = plt.subplots(1, 3)
 
+        # the Elo ranges are aggregated independently in worker processes,
+        # only the single-threaded matplotlib drawing stays on the main thread
+        with ProcessPoolExecutor(max_workers=len(elos)) as executor:
+            aggregates = list(executor.map(_aggregate_heatmap_range,
+                                           [blunders_dict] * len(elos),
+                                           [moves_dict] * len(elos), elos))
+
         for i, ax in enumerate(axes.flat):
             elo_range = elos[i]
 
             # Make a 8x8 grid
             nrows, ncols = 8, 8
-            # initialize arrays for heatmap
-            num_blunders = np.zeros(nrows * ncols)
-            weighted_blunders = np.zeros(nrows * ncols)
-            num_moves = np.zeros(nrows * ncols)
-            blunders_elo = blunders_dict[elo_range[0]]
-            moves_elo = moves_dict[elo_range[0]]
-
-            # combine all blunders for given elo range
-            for elo in range(elo_range[0] + 100, elo_range[1], 100):
-                blunders_elo = Evaluation.merge_dicts_of_lists(blunders_elo, blunders_dict[elo])
-                moves_elo = Evaluation.merge_dicts_of_lists(moves_elo, moves_dict[elo])
-
-            # fill array for heatmap with blunders, based on the square the blunder happened on
-            for piece in blunders_elo:
-                for field, eval_diff, player, _, _, _ in blunders_elo[piece]:
-                    square = field
-                    if "O-O-O" == field:  # account for castling (set kings position)
-                        square = "c1" if player == "w" else "c8"
-                    if "O-O" == field:  # account for castling (set kings position)
-                        square = "g1" if player == "w" else "g8"
-
-                    idx = Evaluation.square_to_index(square)
-                    num_blunders[idx] += 1
-                    weighted_blunders[idx] += eval_diff
-
-            # fill array for heatmap with moves, based on the square the blunder happened on
-            for piece in moves_elo:
-
-                for field, player, _, _, _ in moves_elo[piece]:
-                    square = field
-                    if "O-O-O" == field:  # account for castling (set kings position)
-                        square = "c1" if player == "w" else "c8"
-                    if "O-O" == field:  # account for castling (set kings position)
-                        square = "g1" if player == "w" else "g8"
-
-                    idx = Evaluation.square_to_index(square)
-                    num_moves[idx] += 1
+            num_blunders, weighted_blunders, num_moves = aggregates[i]
 
             print(sum(num_blunders), " blunders found")
             print(sum(num_moves), " moves found")
             print("Blunder Move ratio: ", sum(num_blunders) / sum(num_moves))
 
-            heatmap_data = np.divide(num_blunders, num_moves, np.zeros_like(num_blunders), where=num_moves != 0) * 100
+            # np.maximum keeps the quotient free of divide-by-zero traps,
+            # np.where then zeroes the squares without any moves
+            heatmap_data = np.where(num_moves > 0, 100.0 * num_blunders / np.maximum(num_moves, 1), 0.0)
 
             # Reshape things into a 8x8 grid.
             heatmap_data = heatmap_data.reshape((nrows, ncols))